@@ -291,11 +291,42 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ---------------- RATE AUDITOR DEFAULTS ----------------
+# A blank Expected Rate exempts the section from the check (slab / treaty-rate sections: 192, 194P, 195)
+DEFAULT_RATE_TABLE = pd.DataFrame([
+    ("192", None, None), ("194P", None, None), ("195", None, None),
+    ("192A", 10.0, 0.1), ("193", 10.0, 0.1), ("194", 10.0, 0.1), ("194A", 10.0, 0.1), ("194B", 30.0, 0.1),
+    ("194BB", 30.0, 0.1), ("194C", 1.0, 0.1), ("194C", 2.0, 0.1), ("194D", 5.0, 0.1), ("194D", 2.0, 0.1), ("194D", 10.0, 0.1),
+    ("194DA", 5.0, 0.1), ("194DA", 2.0, 0.1), ("194EE", 10.0, 0.1), ("194G", 5.0, 0.1), ("194G", 2.0, 0.1),
+    ("194H", 5.0, 0.1), ("194H", 2.0, 0.1), ("194I", 2.0, 0.1), ("194I", 10.0, 0.1), ("194IA", 1.0, 0.1),
+    ("194IB", 5.0, 0.1), ("194IB", 2.0, 0.1), ("194J", 2.0, 0.1), ("194J", 10.0, 0.1), ("194JA", 2.0, 0.1),
+    ("194JB", 10.0, 0.1), ("194K", 10.0, 0.1), ("194LA", 10.0, 0.1), ("194M", 5.0, 0.1), ("194M", 2.0, 0.1),
+    ("194N", 2.0, 0.1), ("194O", 1.0, 0.1), ("194O", 0.1, 0.02), ("194Q", 0.1, 0.02), ("194R", 10.0, 0.1),
+    ("194S", 1.0, 0.1), ("*", 20.0, 0.1)
+], columns=["Section", "Expected Rate (%)", "Band (±%)"])
+
 # ---------------- SIDEBAR ----------------
 with st.sidebar:
     st.markdown("### ⚙️ Engine Settings")
     tolerance = st.number_input("Mismatch Tolerance (₹)", min_value=0, value=10, step=1)
+    score_cutoff = st.slider("Fuzzy Match Cutoff (score)", min_value=0, max_value=100, value=70, step=1)
     max_rows = st.number_input("Max Rows for Excel Formulas", min_value=1000, value=15000, step=1000)
+
+    st.markdown("---")
+    st.markdown("### 🧪 What-If Sensitivity")
+    st.info("Comma-separated grids evaluated in one pass from the stored match scores. Current settings are always included. "
+            "Cutoffs below the engine cutoff need a rerun; higher cutoffs unpair weaker fuzzy matches without re-pairing the freed Books rows.")
+    whatif_tol_text = st.text_input("Tolerances (₹)", value="0, 10, 100, 1000")
+    whatif_cut_text = st.text_input("Fuzzy Cutoffs", value="70, 80, 90")
+    whatif_tolerances = sorted({float(v) for v in re.findall(r"\d+(?:\.\d+)?", whatif_tol_text)} | {float(tolerance)})
+    whatif_cut_values = {min(float(v), 100.0) for v in re.findall(r"\d+(?:\.\d+)?", whatif_cut_text)}
+    whatif_dropped = sorted(v for v in whatif_cut_values if v < score_cutoff)
+    whatif_cutoffs = sorted({v for v in whatif_cut_values if v >= score_cutoff} | {float(score_cutoff)})
+
+    st.markdown("---")
+    st.markdown("### 📐 TDS Rate Auditor")
+    st.info("Expected rates per section. Add a row per valid rate; section `*` applies to every section (e.g. 206AA higher rate). Leave the rate blank to skip slab-rate sections.")
+    rate_table = st.data_editor(DEFAULT_RATE_TABLE, num_rows="dynamic", use_container_width=True, hide_index=True, key="rate_table")
     
     st.markdown("---")
     st.markdown("### 🧠 AI Smart Memory")
@@ -373,7 +404,7 @@ with col_b2:
 def extract_26as_summary_and_section(file_bytes):
     text = file_bytes.decode("utf-8", errors="ignore")
     lines = text.splitlines()
-    summary_data, section_map = [], {}
+    summary_data, section_data, section_map = [], [], {}
     in_part1, current_tan = False, ""
 
     for line in lines:
@@ -381,13 +412,25 @@ def extract_26as_summary_and_section(file_bytes):
         for p in parts:
             if re.fullmatch(r"[A-Z]{4}[0-9]{5}[A-Z]", p): current_tan = p
 
-        sec = next((p for p in parts if re.fullmatch(r"\d+[A-Z]+", p)), None)
+        sec = next((p for p in parts[1:] if re.fullmatch(r"\d{3}[A-Z]*", p)), None)
         if current_tan and sec and current_tan not in section_map: section_map[current_tan] = sec
 
         if "PART-I - Details of Tax Deducted at Source" in line:
             in_part1 = True; continue
         if in_part1 and line.startswith("^PART-"): break
 
+        # Transaction lines: Sr No ^ Section ^ Date ^ ... ^ Amount Paid ^ Tax Deducted ^ TDS Deposited
+        if in_part1 and current_tan and len(parts) >= 5 and re.fullmatch(r"\d+", parts[0]) and re.fullmatch(r"\d{3}[A-Z]*", parts[1]):
+            try:
+                section_data.append({
+                    "Section": parts[1], "TAN of Deductor": current_tan,
+                    "Total Amount Paid / Credited": float(parts[-3].replace(",","")),
+                    "Total Tax Deducted": float(parts[-2].replace(",","")),
+                    "Total TDS Deposited": float(parts[-1].replace(",",""))
+                })
+            except Exception: pass
+            continue
+
         if in_part1 and len(parts) >= 6 and re.fullmatch(r"\d+", parts[0]):
             if re.fullmatch(r"[A-Z]{4}[0-9]{5}[A-Z]", parts[2]):
                 try:
@@ -401,12 +444,62 @@ def extract_26as_summary_and_section(file_bytes):
 
     df = pd.DataFrame(summary_data)
     if not df.empty: df.insert(0, "Section", df["TAN of Deductor"].map(section_map).fillna(""))
-    return df
+
+    # One row per (TAN, Section) so deductors using several sections are audited section by section
+    section_df = pd.DataFrame(section_data)
+    if not section_df.empty:
+        section_df = section_df.groupby(["TAN of Deductor", "Section"], as_index=False, sort=False).sum()
+        names = df.drop_duplicates("TAN of Deductor").set_index("TAN of Deductor")["Name of Deductor"] if not df.empty else pd.Series(dtype=str)
+        section_df.insert(1, "Name of Deductor", section_df["TAN of Deductor"].map(names).fillna(""))
+    return df, section_df
+
+def audit_tds_rates(section_df, rate_table):
+    """Flag every (TAN, Section) whose effective rate falls outside all tolerance bands configured for that section."""
+    if section_df.empty: return pd.DataFrame()
+
+    rates = rate_table.dropna(subset=["Section"]).copy()
+    rates["Section"] = rates["Section"].astype(str).str.strip().str.upper()
+    rates["Expected Rate (%)"] = pd.to_numeric(rates["Expected Rate (%)"], errors="coerce")
+    rates["Band (±%)"] = pd.to_numeric(rates["Band (±%)"], errors="coerce").fillna(0).abs()
+    # A section is exempt only when none of its rows carries a rate; incomplete rows are otherwise ignored
+    blank = rates["Expected Rate (%)"].isna()
+    exempt = rates.loc[blank & ~rates["Section"].isin(rates.loc[~blank, "Section"]), "Section"]
+    rates = rates[~blank]
+
+    audit = section_df[(section_df["Total Amount Paid / Credited"] > 0) & ~section_df["Section"].isin(exempt)].copy()
+    audit["Effective Rate 26AS (%)"] = (audit["Total TDS Deposited"] / audit["Total Amount Paid / Credited"] * 100).round(2)
+    audit = audit[audit["Effective Rate 26AS (%)"] > 0].reset_index(drop=True)
+    if audit.empty: return pd.DataFrame()
+    audit["_row"] = audit.index
+
+    # Single join against the rate table: section-specific bands plus wildcard ("*") bands for every row
+    specific, wildcard = rates[rates["Section"] != "*"], rates[rates["Section"] == "*"].drop(columns="Section")
+    joined = pd.concat([
+        audit[["_row", "Section", "Effective Rate 26AS (%)"]].merge(specific, on="Section", how="inner"),
+        audit[["_row", "Effective Rate 26AS (%)"]].merge(wildcard, how="cross")
+    ], ignore_index=True)
+    joined["Gap"] = (joined["Effective Rate 26AS (%)"] - joined["Expected Rate (%)"]).abs()
+    joined["Within Band"] = joined["Gap"] <= joined["Band (±%)"] + 1e-9
+
+    within = joined.groupby("_row")["Within Band"].any().reindex(audit.index, fill_value=False)
+    nearest = joined.loc[joined.groupby("_row")["Gap"].idxmin()].set_index("_row")
+    expected = specific.drop_duplicates(["Section", "Expected Rate (%)"]).sort_values("Expected Rate (%)")
+    expected = expected.assign(Rate=expected["Expected Rate (%)"].map("{:g}".format)).groupby("Section")["Rate"].agg(", ".join)
+    audit["Expected Rates (%)"] = audit["Section"].map(expected).fillna("")
+    audit["Nearest Expected Rate (%)"] = nearest["Expected Rate (%)"].reindex(audit.index)
+    audit["Deviation (%)"] = (audit["Effective Rate 26AS (%)"] - audit["Nearest Expected Rate (%)"]).round(2)
+    audit["Audit Finding"] = np.where(audit["Section"].isin(specific["Section"]), "Rate outside tolerance band", "Section not in rate table")
+
+    anomalies = audit[~within.values].sort_values("Total TDS Deposited", ascending=False)
+    return anomalies[[
+        "Section", "Name of Deductor", "TAN of Deductor", "Total Amount Paid / Credited", "Total TDS Deposited",
+        "Effective Rate 26AS (%)", "Expected Rates (%)", "Nearest Expected Rate (%)", "Deviation (%)", "Audit Finding"
+    ]].reset_index(drop=True)
 
 @st.cache_data(show_spinner=False)
-def process_data(txt_bytes, books_bytes):
-    structured_26as = extract_26as_summary_and_section(txt_bytes)
-    if structured_26as.empty: return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+def process_data(txt_bytes, books_bytes, score_cutoff=70):
+    structured_26as, section_26as = extract_26as_summary_and_section(txt_bytes)
+    if structured_26as.empty: return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
     books = pd.read_excel(io.BytesIO(books_bytes))
     required_cols = ["Party Name", "TAN", "Books Amount", "Books TDS"]
@@ -424,6 +517,7 @@ def process_data(txt_bytes, books_bytes):
 
     exact_match = pd.merge(structured_26as, books, left_on="TAN of Deductor", right_on="TAN", how="inner")
     exact_match["Match Type"] = "Exact (TAN)"
+    exact_match["Match Score"] = 100.0
 
     rem_26as = structured_26as[~structured_26as["TAN of Deductor"].isin(exact_match["TAN of Deductor"])]
     rem_books = books[~books["TAN"].isin(exact_match["TAN"])]
@@ -436,10 +530,10 @@ def process_data(txt_bytes, books_bytes):
         if not book_choices:
             combined = row_26.to_dict(); combined["Match Type"] = "Missing in Books"; fuzzy_records.append(combined); continue
             
-        result = process.extractOne(name_26, book_choices, scorer=fuzz.token_sort_ratio, score_cutoff=70)
+        result = process.extractOne(name_26, book_choices, scorer=fuzz.token_sort_ratio, score_cutoff=score_cutoff)
         if result:
             best_match_str, best_score, best_book_idx = result
-            combined = row_26.to_dict(); combined.update(rem_books.loc[best_book_idx].to_dict()); combined["Match Type"] = "Fuzzy Match"
+            combined = row_26.to_dict(); combined.update(rem_books.loc[best_book_idx].to_dict()); combined["Match Type"] = "Fuzzy Match"; combined["Match Score"] = best_score
             fuzzy_records.append(combined); matched_books_indices.add(best_book_idx); del book_choices[best_book_idx] 
         else:
             combined = row_26.to_dict(); combined["Match Type"] = "Missing in Books"; fuzzy_records.append(combined)
@@ -453,7 +547,41 @@ def process_data(txt_bytes, books_bytes):
     recon["Deductor / Party Name"] = np.where(recon["Name of Deductor"].notna() & (recon["Name of Deductor"] != ""), recon["Name of Deductor"], recon["Party Name"])
     recon["Final TAN"] = np.where(recon["TAN of Deductor"].notna() & (recon["TAN of Deductor"] != ""), recon["TAN of Deductor"], recon["TAN"])
 
-    return recon, structured_26as, books
+    return recon, structured_26as, books, section_26as
+
+def sweep_match_status(recon, tolerances, cutoffs):
+    """Classify every row for each (cutoff, tolerance) pair in one broadcast np.select and total counts / TDS per Match Status."""
+    shape = (len(cutoffs), len(tolerances), len(recon))
+    tol = np.asarray(tolerances, dtype=float)[None, :, None]
+    cut = np.asarray(cutoffs, dtype=float)[:, None, None]
+    match_type = recon["Match Type"].to_numpy()
+    diff_tds = recon["Difference TDS"].abs().to_numpy()
+    score = recon["Match Score"].fillna(0).to_numpy() if "Match Score" in recon else np.zeros(len(recon))
+    tds_26, tds_bk = recon["Total TDS Deposited"].to_numpy(), recon["Books TDS"].to_numpy()
+
+    # A fuzzy pair scoring below the cutoff splits back into a Missing in Books row and a Missing in 26AS row
+    exact = np.isin(match_type, ["Exact (TAN)", "Dictionary Match"])
+    fuzzy = (match_type == "Fuzzy Match") & (score >= cut)
+    split = (match_type == "Fuzzy Match") & (score < cut)
+    conditions = [np.broadcast_to(c, shape) for c in [
+        exact & (diff_tds <= tol), exact & (diff_tds > tol),
+        fuzzy & (diff_tds <= tol), fuzzy & (diff_tds > tol),
+        (match_type == "Missing in Books") | split,
+        match_type == "Missing in 26AS"
+    ]]
+    statuses = ["Exact Match", "Fuzzy Match", "Value Mismatch", "Missing in Books", "Missing in 26AS"]
+    codes = np.select(conditions, [0, 2, 1, 2, 3, 4], default=-1)
+    onehot = codes[..., None] == np.arange(len(statuses))
+    split_onehot = split[..., None] & (np.arange(len(statuses)) == 4)
+
+    counts = onehot.sum(axis=2) + split_onehot.sum(axis=2)
+    impact_26 = (onehot * tds_26[:, None]).sum(axis=2)
+    impact_bk = (onehot * np.where(split, 0, tds_bk)[..., None]).sum(axis=2) + (split_onehot * tds_bk[:, None]).sum(axis=2)
+
+    grid = pd.MultiIndex.from_product([cutoffs, tolerances, statuses], names=["Fuzzy Cutoff", "Tolerance (₹)", "Match Status"])
+    return pd.DataFrame({
+        "Record Count": counts.ravel(), "TDS Impact (26AS)": impact_26.ravel(), "TDS Impact (Books)": impact_bk.ravel()
+    }, index=grid).reset_index()
 
 # ---------------- MAIN APPLICATION LOGIC ----------------
 if run_engine:
@@ -461,7 +589,7 @@ if run_engine:
         st.warning("⚠️ Please upload both the 26AS and Books files to proceed.")
     else:
         with st.spinner("Running High-Speed AI Engine & Rate Auditor..."):
-            raw_recon, structured_26as, books = process_data(txt_file.getvalue(), books_file.getvalue())
+            raw_recon, structured_26as, books, section_26as = process_data(txt_file.getvalue(), books_file.getvalue(), score_cutoff)
 
         if raw_recon.empty:
             st.error("❌ No valid PART-I summary detected in the 26AS text file.")
@@ -474,8 +602,8 @@ if run_engine:
             for tan_26, target_bk_name in known_mappings.items():
                 row_26_idx = recon[(recon['TAN of Deductor'] == tan_26) & (recon['Match Type'] == 'Missing in Books')].index
                 row_bk_idx = recon[(recon['Party Name'] == target_bk_name) & (recon['Match Type'] == 'Missing in 26AS')].index
-                
-                if not row_26_idx.empty() and not row_bk_idx.empty():
+            
+                if not row_26_idx.empty and not row_bk_idx.empty:
                     i_26, i_bk = row_26_idx[0], row_bk_idx[0]
                     recon.at[i_26, 'Party Name'] = recon.at[i_bk, 'Party Name']
                     recon.at[i_26, 'TAN'] = recon.at[i_bk, 'TAN']
@@ -517,15 +645,19 @@ if run_engine:
         # ---------------- COMPLIANCE ALERTS (AT THE TOP) ----------------
         st.markdown("### 🚨 Compliance & Anomaly Alerts")
         
-        anomalies = recon[(recon['Effective Rate 26AS (%)'] > 0) & (~recon['Effective Rate 26AS (%)'].isin([1.0, 2.0, 5.0, 10.0, 20.0]))]
-        if not anomalies.empty:
-            top_anomaly = anomalies.nlargest(1, 'Total TDS Deposited').iloc[0]
+        rate_anomalies = audit_tds_rates(section_26as, rate_table)
+        if section_26as.empty:
+            st.info("ℹ️ Section-wise rate audit unavailable: the 26AS text file has no transaction-level section lines.")
+        elif not rate_anomalies.empty:
+            top_anomaly = rate_anomalies.iloc[0]
             st.markdown(f"""
             <div class="alert-box-blue">
-                <b>🔎 TDS Rate Anomaly Detected:</b> Non-standard deduction rates identified.<br>
-                <span style="color: #7dd3fc; font-size: 0.95rem;"><i>👉 <b>{top_anomaly['Deductor / Party Name']}</b> deducted TDS at an effective rate of <b>{top_anomaly['Effective Rate 26AS (%)']}%</b>.</i></span>
+                <b>🔎 TDS Rate Anomaly Detected:</b> {len(rate_anomalies)} section-wise deduction(s) fall outside the expected rate bands.<br>
+                <span style="color: #7dd3fc; font-size: 0.95rem;"><i>👉 Largest: <b>{top_anomaly['Name of Deductor']}</b> deducted TDS u/s <b>{top_anomaly['Section']}</b> at an effective rate of <b>{top_anomaly['Effective Rate 26AS (%)']}%</b>.</i></span>
             </div>
             """, unsafe_allow_html=True)
+            with st.expander(f"View all {len(rate_anomalies)} rate anomalies"):
+                st.dataframe(rate_anomalies, use_container_width=True, hide_index=True)
 
         miss_in_books = recon[recon["Match Status"] == "Missing in Books"]
         if not miss_in_books.empty and miss_in_books["Total TDS Deposited"].sum() > 0:
@@ -579,6 +711,18 @@ if run_engine:
             fig_sec.update_layout(plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)", font=dict(color="#f8fafc", family="Poppins"), legend_title_text="")
             st.plotly_chart(fig_sec, use_container_width=True)
 
+        # ---------------- WHAT-IF SENSITIVITY ----------------
+        st.markdown("### 🧪 What-If Sensitivity")
+        # Grid cutoffs are >= the engine cutoff, so every cell is derived from this run's stored scores
+        sensitivity = sweep_match_status(recon, whatif_tolerances, whatif_cutoffs)
+        if whatif_dropped:
+            st.warning(f"⚠️ Cutoffs below the engine cutoff ({score_cutoff}) were skipped: {', '.join(f'{v:g}' for v in whatif_dropped)}. Lower the Fuzzy Match Cutoff and rerun to evaluate them.")
+        w1, w2, w3 = st.tabs(["Record Count", "TDS Impact (26AS)", "TDS Impact (Books)"])
+        for tab, metric in zip([w1, w2, w3], ["Record Count", "TDS Impact (26AS)", "TDS Impact (Books)"]):
+            with tab:
+                pivot = sensitivity.pivot_table(index=["Fuzzy Cutoff", "Tolerance (₹)"], columns="Match Status", values=metric, sort=False)
+                st.dataframe(pivot.style.format("{:,.0f}" if metric == "Record Count" else "₹ {:,.2f}"), use_container_width=True)
+
         # --- Excel Export ---
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
@@ -651,7 +795,23 @@ if run_engine:
 
             sheet_recon.autofilter(1, 0, max_rows, len(final_recon.columns) - 1)
 
-            # C. Raw Data Sheets with Auto-Width
+            # C. Rate Audit Sheet (every anomaly)
+            if not rate_anomalies.empty:
+                rate_anomalies.to_excel(writer, sheet_name="Rate Audit", index=False)
+                sheet_rate = writer.sheets["Rate Audit"]
+                for i, col in enumerate(rate_anomalies.columns):
+                    sheet_rate.write(0, i, col, fmt_dark_blue_white)
+                    max_len = max(rate_anomalies[col].astype(str).map(len).max(), len(str(col)))
+                    sheet_rate.set_column(i, i, min(max_len + 3, 45))
+
+            # D. What-If Sensitivity Sheet
+            sensitivity.to_excel(writer, sheet_name="What-If", index=False)
+            sheet_whatif = writer.sheets["What-If"]
+            for i, col in enumerate(sensitivity.columns):
+                sheet_whatif.write(0, i, col, fmt_dark_blue_white)
+                sheet_whatif.set_column(i, i, 20)
+
+            # E. Raw Data Sheets with Auto-Width
             structured_26as.to_excel(writer, sheet_name="26AS Raw", index=False)
             sheet_26_raw = writer.sheets["26AS Raw"]
             for i, col in enumerate(structured_26as.columns):